@@ -0,0 +1,9 @@
+"""Pytest root conftest.
+
+Puts src/ on sys.path exactly once so test modules import the package the
+same way an editable install would, without per-module path munging.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "src"))
@@ -4,9 +4,10 @@ BlackRoad Customer Journey Mapper
 Maps, analyzes and visualizes multi-channel customer journeys.
 """
 
+import contextlib
 import dataclasses
 import sqlite3
-import datetime
+import time
 import json
 import argparse
 import sys
@@ -30,18 +31,104 @@ NC      = "\033[0m"
 
 DEFAULT_DB = os.path.expanduser("~/.blackroad/customer_journey.db")
 
+# Bumped whenever the table layout changes incompatibly; stored in the
+# database via PRAGMA user_version so init_db can tell a current schema
+# from a legacy one.
+_SCHEMA_VERSION = 1
+
+
+def _pack_meta(metadata: Optional[Dict[str, Any]]) -> bytes:
+    """Encode touchpoint metadata as compact UTF-8 JSON bytes.
+
+    Separator-free JSON stored as a BLOB is noticeably smaller than the
+    default json.dumps TEXT representation, which matters on wide scans.
+    """
+    return json.dumps(metadata or {}, separators=(",", ":")).encode("utf-8")
+
+
+def _unpack_meta(blob: Optional[bytes]) -> Dict[str, Any]:
+    """Decode metadata stored by :func:`_pack_meta`."""
+    if not blob:
+        return {}
+    if isinstance(blob, bytes):
+        blob = blob.decode("utf-8")
+    return json.loads(blob)
+
+
+def _now_ms() -> int:
+    """Current time as integer epoch milliseconds (the stored timestamp unit)."""
+    return int(time.time() * 1000)
+
+
+def _day_str(ms: int) -> str:
+    """UTC calendar day ('YYYY-MM-DD') for an epoch-ms timestamp."""
+    return time.strftime("%Y-%m-%d", time.gmtime(ms / 1000))
+
+
+def _reduce_path(positions) -> Tuple[Tuple[int, ...], int]:
+    """Reduce visited stage positions to ordered uniques plus a packed signature.
+
+    The signature packs up to 16 stage positions (4 bits each, positions
+    1–15) into a single int, so two equal paths compare as one integer
+    instead of a variable-length string. Runs on plain ints, which keeps
+    the per-end_session reduction out of string territory entirely.
+    """
+    ordered = tuple(sorted(set(positions)))
+    sig = 0
+    for pos in ordered:
+        sig = (sig << 4) | (pos & 0xF)
+    return ordered, sig
+
+
+# Hot-path SQL lives in module constants so repeated executes hit the
+# connection's prepared-statement cache on a stable key. The cache is keyed
+# on the exact SQL text (connections are opened with cached_statements=1024),
+# so method-level literals benefit too; the constants exist for the busiest
+# inserts, where the shared text also keeps call sites in sync.
+_INSERT_SESSION_SQL = """INSERT INTO sessions
+    (uuid, customer_id, start_time, channel_id, device, converted, conversion_value)
+    VALUES (?, ?, ?, ?, ?, 0, 0.0)"""
+
+_INSERT_TP_SQL = """INSERT INTO touchpoints
+    (uuid, session_id, customer_id, channel_id, page, event_type_id,
+     timestamp, duration_ms, metadata)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+
+# Touchpoint index DDL is shared between init_db and bulk_load, which drops
+# these indexes for the duration of a bulk ingest and rebuilds them after.
+_TP_INDEX_DDL = """
+    -- Composite (…, timestamp) indexes serve both the plain equality
+    -- lookups and any per-session / per-customer ORDER BY timestamp without
+    -- a temp B-tree sort.
+    CREATE INDEX IF NOT EXISTS idx_tp_session_ts  ON touchpoints(session_id, timestamp);
+    CREATE INDEX IF NOT EXISTS idx_tp_customer_ts ON touchpoints(customer_id, timestamp);
+    CREATE INDEX IF NOT EXISTS idx_tp_timestamp   ON touchpoints(timestamp);
+    -- Covering index for the analyze_funnel joins: (event_type_id,
+    -- session_id, duration_ms) answers the COUNT(DISTINCT) and AVG queries
+    -- without touching the touchpoints table itself.
+    CREATE INDEX IF NOT EXISTS idx_tp_event_session
+        ON touchpoints(event_type_id, session_id, duration_ms);
+"""
+
+_TP_INDEX_DROP_DDL = """
+    DROP INDEX IF EXISTS idx_tp_session_ts;
+    DROP INDEX IF EXISTS idx_tp_customer_ts;
+    DROP INDEX IF EXISTS idx_tp_timestamp;
+    DROP INDEX IF EXISTS idx_tp_event_session;
+"""
+
 
 # ── Dataclasses ────────────────────────────────────────────────────────────────
 
 @dataclasses.dataclass
 class Touchpoint:
-    id: str
-    session_id: str
+    id: int
+    session_id: int
     customer_id: str
     channel: str
     page: str
     event_type: str
-    timestamp: str
+    timestamp: int
     duration_ms: int
     metadata: Dict[str, Any]
 
@@ -58,10 +145,10 @@ class FunnelStage:
 
 @dataclasses.dataclass
 class CustomerSession:
-    id: str
+    id: int
     customer_id: str
-    start_time: str
-    end_time: Optional[str]
+    start_time: int
+    end_time: Optional[int]
     channel: str
     device: str
     converted: bool
@@ -70,21 +157,21 @@ class CustomerSession:
 
 @dataclasses.dataclass
 class ConversionPath:
-    id: str
-    session_id: str
+    id: int
+    session_id: int
     stages_visited: List[str]
     path_signature: str
     converted: bool
-    created_at: str
+    created_at: int
 
 
 @dataclasses.dataclass
 class DropoffEvent:
-    id: str
-    session_id: str
+    id: int
+    session_id: int
     stage_id: str
     stage_name: str
-    timestamp: str
+    timestamp: int
     reason: str
 
 
@@ -93,16 +180,63 @@ class DropoffEvent:
 class CustomerJourneyMapper:
     """Maps and analyzes multi-stage customer journeys with funnel analytics."""
 
-    def __init__(self, db_path: str = DEFAULT_DB):
+    def __init__(self, db_path: str = DEFAULT_DB, read_replica: Optional[str] = None):
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
         self.db_path = db_path
-        self.conn = sqlite3.connect(db_path)
+        self.conn = sqlite3.connect(db_path, cached_statements=1024)
         self.conn.row_factory = sqlite3.Row
+        # WAL + relaxed sync turn the fsync-per-INSERT default into group
+        # commit; the ingest path is commit-bound, not compute-bound.
+        self.conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            PRAGMA temp_store=MEMORY;
+            PRAGMA mmap_size=268435456;
+            PRAGMA cache_size=-65536;
+            PRAGMA busy_timeout=5000;
+        """)
+        # Shared cursor for the ingest path; the mapper is single-threaded.
+        self._cur = self.conn.cursor()
+        # Batched entropy pool for _next_uuid.
+        self._uuid_pool = b""
+        self._uuid_idx = 0
+        self._txn_depth = 0
+        # name → id caches for the channels / event_types lookup tables.
+        self._channel_ids: Dict[str, int] = {}
+        self._event_type_ids: Dict[str, int] = {}
+        # Analytics reads can go to a read-only mmap'd replica so they never
+        # contend with writers on the primary.
+        if read_replica:
+            self.read_conn = sqlite3.connect(read_replica, cached_statements=1024)
+            self.read_conn.row_factory = sqlite3.Row
+            self.read_conn.executescript("""
+                PRAGMA query_only=1;
+                PRAGMA mmap_size=1073741824;
+            """)
+        else:
+            self.read_conn = self.conn
         self.init_db()
 
     def init_db(self) -> None:
         """Initialize the 5-table schema."""
         cur = self.conn.cursor()
+        # Fast path for already-initialized DBs (reopens, template clones):
+        # skip parsing the full DDL script when the schema is current.
+        version = cur.execute("PRAGMA user_version").fetchone()[0]
+        if version == _SCHEMA_VERSION:
+            self._stage_by_entry: Optional[Dict[str, Dict[str, Any]]] = None
+            return
+        # Refuse to run the DDL over a database laid out by an older release:
+        # CREATE TABLE IF NOT EXISTS would silently keep the incompatible
+        # tables and fail later with opaque "no such column" errors.
+        if cur.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='sessions'"
+        ).fetchone():
+            raise RuntimeError(
+                f"{self.db_path} was created with an incompatible schema "
+                f"(user_version {version}, expected {_SCHEMA_VERSION}); "
+                "export its data and remove the file so it can be recreated"
+            )
         cur.executescript("""
             CREATE TABLE IF NOT EXISTS funnel_stages (
                 id           TEXT PRIMARY KEY,
@@ -111,58 +245,235 @@ class CustomerJourneyMapper:
                 description  TEXT,
                 entry_event  TEXT,
                 exit_event   TEXT
-            );
-
+            ) STRICT;
+
+            -- Low-cardinality strings (channel names, event types) live in
+            -- lookup tables; fact tables store only the small integer id,
+            -- which shrinks rows and turns GROUP BY/joins on them into
+            -- integer compares. The public API stays string-based — ids are
+            -- interned once at the write boundary.
+            CREATE TABLE IF NOT EXISTS channels (
+                id   INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL UNIQUE
+            ) STRICT;
+
+            CREATE TABLE IF NOT EXISTS event_types (
+                id   INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL UNIQUE
+            ) STRICT;
+
+            -- Fact tables use integer rowid keys for B-tree locality and
+            -- smaller rows; the uuid BLOB (16 bytes) is kept only for
+            -- externally exposed identifiers. All tables are STRICT
+            -- (SQLite >= 3.37): exact column types skip per-comparison
+            -- affinity coercion and reject mistyped writes outright.
             CREATE TABLE IF NOT EXISTS sessions (
-                id               TEXT PRIMARY KEY,
+                id               INTEGER PRIMARY KEY AUTOINCREMENT,
+                uuid             BLOB,
                 customer_id      TEXT NOT NULL,
-                start_time       TEXT NOT NULL,
-                end_time         TEXT,
-                channel          TEXT NOT NULL,
+                start_time       INTEGER NOT NULL,
+                end_time         INTEGER,
+                channel_id       INTEGER NOT NULL REFERENCES channels(id),
                 device           TEXT NOT NULL,
                 converted        INTEGER DEFAULT 0,
-                conversion_value REAL DEFAULT 0.0
-            );
+                conversion_value REAL DEFAULT 0.0,
+                -- Bitmask of funnel stage positions entered (bit n = stage at
+                -- position n), ORed in as touchpoints are recorded so
+                -- end_session never re-scans touchpoints to rebuild the path.
+                stages_visited_mask INTEGER NOT NULL DEFAULT 0
+            ) STRICT;
 
             CREATE TABLE IF NOT EXISTS touchpoints (
-                id           TEXT PRIMARY KEY,
-                session_id   TEXT NOT NULL,
-                customer_id  TEXT NOT NULL,
-                channel      TEXT NOT NULL,
-                page         TEXT NOT NULL,
-                event_type   TEXT NOT NULL,
-                timestamp    TEXT NOT NULL,
-                duration_ms  INTEGER DEFAULT 0,
-                metadata     TEXT DEFAULT '{}',
+                id            INTEGER PRIMARY KEY AUTOINCREMENT,
+                uuid          BLOB,
+                session_id    INTEGER NOT NULL,
+                customer_id   TEXT NOT NULL,
+                channel_id    INTEGER NOT NULL REFERENCES channels(id),
+                page          TEXT NOT NULL,
+                event_type_id INTEGER NOT NULL REFERENCES event_types(id),
+                timestamp     INTEGER NOT NULL,
+                duration_ms   INTEGER DEFAULT 0,
+                metadata      BLOB,
                 FOREIGN KEY (session_id) REFERENCES sessions(id)
-            );
+            ) STRICT;
 
             CREATE TABLE IF NOT EXISTS conversion_paths (
-                id             TEXT PRIMARY KEY,
-                session_id     TEXT NOT NULL,
+                id             INTEGER PRIMARY KEY AUTOINCREMENT,
+                uuid           BLOB,
+                session_id     INTEGER NOT NULL,
                 stages_visited TEXT NOT NULL,
                 path_signature TEXT NOT NULL,
+                -- Packed-int form of path_signature (_reduce_path): grouping
+                -- and index keys are 8-byte integers instead of UTF-8 strings.
+                path_sig       INTEGER NOT NULL DEFAULT 0,
                 converted      INTEGER DEFAULT 0,
-                created_at     TEXT NOT NULL,
+                created_at     INTEGER NOT NULL,
                 FOREIGN KEY (session_id) REFERENCES sessions(id)
-            );
+            ) STRICT;
 
             CREATE TABLE IF NOT EXISTS dropoff_events (
-                id         TEXT PRIMARY KEY,
-                session_id TEXT NOT NULL,
+                id         INTEGER PRIMARY KEY AUTOINCREMENT,
+                uuid       BLOB,
+                session_id INTEGER NOT NULL,
                 stage_id   TEXT NOT NULL,
                 stage_name TEXT NOT NULL,
-                timestamp  TEXT NOT NULL,
+                timestamp  INTEGER NOT NULL,
                 reason     TEXT DEFAULT 'unknown',
+                -- Derived hour-of-day; indexed below so the time-of-day
+                -- aggregation is served straight from the index.
+                hour       INTEGER GENERATED ALWAYS AS
+                               ((timestamp / 3600000) % 24) VIRTUAL,
                 FOREIGN KEY (session_id) REFERENCES sessions(id)
-            );
-
-            CREATE INDEX IF NOT EXISTS idx_tp_session   ON touchpoints(session_id);
-            CREATE INDEX IF NOT EXISTS idx_tp_customer  ON touchpoints(customer_id);
-            CREATE INDEX IF NOT EXISTS idx_tp_timestamp ON touchpoints(timestamp);
-            CREATE INDEX IF NOT EXISTS idx_cp_sig       ON conversion_paths(path_signature);
+            ) STRICT;
+
+            -- Per-channel, per-day rollup maintained by start_session /
+            -- end_session so channel attribution reads days×channels rows
+            -- instead of scanning sessions.
+            CREATE TABLE IF NOT EXISTS channel_daily (
+                channel     TEXT NOT NULL,
+                day         TEXT NOT NULL,
+                sessions    INTEGER NOT NULL DEFAULT 0,
+                conversions INTEGER NOT NULL DEFAULT 0,
+                value_sum   REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (channel, day)
+            ) STRICT;
+
+            -- Incrementally maintained rollup of conversion_paths, updated in
+            -- end_session so get_top_conversion_paths reads O(unique paths)
+            -- rows instead of re-grouping every session.
+            -- Keyed by the packed integer signature; the display string is
+            -- carried along only for rendering.
+            CREATE TABLE IF NOT EXISTS path_stats (
+                path_sig       INTEGER PRIMARY KEY,
+                path_signature TEXT NOT NULL,
+                occurrences    INTEGER NOT NULL DEFAULT 0,
+                conversions    INTEGER NOT NULL DEFAULT 0
+            ) STRICT;
+
+            CREATE INDEX IF NOT EXISTS idx_cp_sig       ON conversion_paths(path_sig);
+            -- Serves the ORDER BY occurrences DESC LIMIT n in
+            -- get_top_conversion_paths without a full sort of path_stats.
+            CREATE INDEX IF NOT EXISTS idx_path_stats_occ ON path_stats(occurrences DESC);
+            CREATE INDEX IF NOT EXISTS idx_sessions_start ON sessions(start_time, converted);
+            CREATE INDEX IF NOT EXISTS idx_do_stage       ON dropoff_events(stage_id);
+            CREATE INDEX IF NOT EXISTS idx_do_stage_hour  ON dropoff_events(stage_id, hour);
+
+            ANALYZE;
         """)
+        cur.executescript(_TP_INDEX_DDL)
+        # Stamp the layout version last so a half-built schema never passes
+        # the fast-path check above.
+        cur.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
         self.conn.commit()
+        self._stage_by_entry: Optional[Dict[str, Dict[str, Any]]] = None
+
+    @contextlib.contextmanager
+    def bulk_load(self):
+        """Drop touchpoint indexes for a bulk ingest phase; rebuild on exit.
+
+        Indexed inserts pay a B-tree update per index per row — delaying the
+        indexes until the load is done is dramatically faster. Usage::
+
+            with mapper.bulk_load():
+                mapper.record_touchpoints_bulk(rows)
+        """
+        # Restore whatever enforcement mode the connection was opened with
+        # (sqlite3 defaults to OFF) rather than hardcoding ON on exit.
+        fk_mode = self.conn.execute("PRAGMA foreign_keys").fetchone()[0]
+        self.conn.executescript(_TP_INDEX_DROP_DDL + "PRAGMA foreign_keys=OFF;")
+        try:
+            yield self
+        finally:
+            self.conn.executescript(
+                _TP_INDEX_DDL + f"PRAGMA foreign_keys={fk_mode}; ANALYZE;"
+            )
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Group many small writes into a single commit.
+
+        Write methods each commit on their own; wrapping a loop of them in
+        this context collapses N fsyncs into one::
+
+            with mapper.transaction():
+                for row in rows:
+                    mapper.record_touchpoint(*row)
+
+        Re-entrant: nested uses join the outermost transaction, which commits
+        on clean exit and rolls back if the block raises.
+        """
+        if self._txn_depth:
+            yield
+            return
+        self._txn_depth += 1
+        try:
+            with self.conn:
+                yield
+        except BaseException:
+            # The rollback removed any lookup rows interned and any stages
+            # defined inside the block; drop the caches that reference them
+            # so later writes re-intern instead of storing dangling ids.
+            self._channel_ids.clear()
+            self._event_type_ids.clear()
+            self._stage_by_entry = None
+            raise
+        finally:
+            self._txn_depth -= 1
+
+    def _next_uuid(self) -> uuid.UUID:
+        """Random (version 4) UUID carved from a batched os.urandom pool.
+
+        uuid.uuid4() costs one getrandom() syscall per id; refilling a 64KB
+        pool amortizes that over 4096 ids on the ingest path.
+        """
+        if self._uuid_idx >= len(self._uuid_pool):
+            self._uuid_pool = os.urandom(16 * 4096)
+            self._uuid_idx = 0
+        b = bytearray(self._uuid_pool[self._uuid_idx:self._uuid_idx + 16])
+        self._uuid_idx += 16
+        b[6] = (b[6] & 0x0F) | 0x40
+        b[8] = (b[8] & 0x3F) | 0x80
+        return uuid.UUID(bytes=bytes(b))
+
+    def _intern(self, table: str, cache: Dict[str, int], name: str) -> int:
+        """Map a lookup-table name to its integer id, creating it on first use.
+
+        Hits the in-memory cache on every call after the first, so the fact
+        tables can store small int ids while the API stays string-based.
+        """
+        _id = cache.get(name)
+        if _id is None:
+            self.conn.execute(
+                f"INSERT OR IGNORE INTO {table} (name) VALUES (?)", (name,)
+            )
+            _id = self.conn.execute(
+                f"SELECT id FROM {table} WHERE name = ?", (name,)
+            ).fetchone()[0]
+            cache[name] = _id
+        return _id
+
+    def _channel_id(self, name: str) -> int:
+        return self._intern("channels", self._channel_ids, name)
+
+    def _event_type_id(self, name: str) -> int:
+        return self._intern("event_types", self._event_type_ids, name)
+
+    def _events_map(self) -> Dict[str, Dict[str, Any]]:
+        """entry_event → stage lookup used on the ingest path, built lazily.
+
+        Stages rarely change, so keeping them in memory saves one SELECT per
+        recorded touchpoint; stage writes just invalidate the cache and the
+        next lookup rebuilds it once.
+        """
+        if self._stage_by_entry is None:
+            self._stage_by_entry = {}
+            cur = self.conn.execute(
+                "SELECT id, name, position, entry_event FROM funnel_stages ORDER BY position"
+            )
+            for row in cur.fetchall():
+                # First match wins, mirroring the old ORDER BY position lookup.
+                self._stage_by_entry.setdefault(row["entry_event"], dict(row))
+        return self._stage_by_entry
 
     # ── Stage Management ───────────────────────────────────────────────────────
 
@@ -175,129 +486,247 @@ class CustomerJourneyMapper:
         exit_event: str = "",
     ) -> FunnelStage:
         """Insert or replace a funnel stage definition."""
-        stage_id = str(uuid.uuid4())
-        cur = self.conn.cursor()
-        cur.execute(
-            """INSERT OR REPLACE INTO funnel_stages
-               (id, name, position, description, entry_event, exit_event)
-               VALUES (?, ?, ?, ?, ?, ?)""",
-            (stage_id, name, position, description, entry_event, exit_event),
-        )
-        self.conn.commit()
+        stage_id = str(self._next_uuid())
+        with self.transaction():
+            self.conn.execute(
+                """INSERT OR REPLACE INTO funnel_stages
+                   (id, name, position, description, entry_event, exit_event)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                (stage_id, name, position, description, entry_event, exit_event),
+            )
+        self._stage_by_entry = None
         return FunnelStage(stage_id, name, position, description, entry_event, exit_event)
 
+    def define_funnel_stages_bulk(
+        self, stages: List[Tuple[str, int, str, str, str]]
+    ) -> List[FunnelStage]:
+        """Define many funnel stages in one transaction.
+
+        Each tuple is (name, position, description, entry_event, exit_event).
+        """
+        created = [
+            FunnelStage(str(self._next_uuid()), name, position, description,
+                        entry_event, exit_event)
+            for name, position, description, entry_event, exit_event in stages
+        ]
+        with self.transaction():
+            self.conn.executemany(
+                """INSERT OR REPLACE INTO funnel_stages
+                   (id, name, position, description, entry_event, exit_event)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                [dataclasses.astuple(s) for s in created],
+            )
+        self._stage_by_entry = None
+        return created
+
     # ── Session Lifecycle ──────────────────────────────────────────────────────
 
     def start_session(
         self, customer_id: str, channel: str, device: str = "unknown"
-    ) -> str:
+    ) -> int:
         """Create and persist a new customer session; returns session_id."""
-        session_id = str(uuid.uuid4())
-        now = datetime.datetime.utcnow().isoformat()
-        cur = self.conn.cursor()
-        cur.execute(
-            """INSERT INTO sessions
-               (id, customer_id, start_time, channel, device, converted, conversion_value)
-               VALUES (?, ?, ?, ?, ?, 0, 0.0)""",
-            (session_id, customer_id, now, channel, device),
-        )
-        self.conn.commit()
-        return session_id
+        now = _now_ms()
+        with self.transaction():
+            cur = self.conn.execute(
+                _INSERT_SESSION_SQL,
+                (self._next_uuid().bytes, customer_id, now,
+                 self._channel_id(channel), device),
+            )
+            self.conn.execute(
+                """INSERT INTO channel_daily (channel, day, sessions)
+                   VALUES (?, ?, 1)
+                   ON CONFLICT(channel, day) DO UPDATE SET
+                       sessions = sessions + 1""",
+                (channel, _day_str(now)),
+            )
+        return cur.lastrowid
 
     def record_touchpoint(
         self,
-        session_id: str,
+        session_id: int,
         customer_id: str,
         channel: str,
         page: str,
         event_type: str,
         duration_ms: int = 0,
         metadata: Optional[Dict[str, Any]] = None,
+        commit: bool = True,
     ) -> Dict[str, Any]:
-        """Record a touchpoint and detect funnel stage transitions."""
-        tp_id = str(uuid.uuid4())
-        now = datetime.datetime.utcnow().isoformat()
-        meta_str = json.dumps(metadata or {})
-        cur = self.conn.cursor()
-        cur.execute(
-            """INSERT INTO touchpoints
-               (id, session_id, customer_id, channel, page, event_type,
-                timestamp, duration_ms, metadata)
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-            (tp_id, session_id, customer_id, channel, page, event_type,
-             now, duration_ms, meta_str),
+        """Record a touchpoint and detect funnel stage transitions.
+
+        Ingest loops should pass ``commit=False`` and call ``self.conn.commit()``
+        once at the end (or use :meth:`record_touchpoints_bulk`) to avoid paying
+        one fsync per row.
+        """
+        now = _now_ms()
+        meta_blob = _pack_meta(metadata)
+        self._cur.execute(
+            _INSERT_TP_SQL,
+            (self._next_uuid().bytes, session_id, customer_id,
+             self._channel_id(channel), page, self._event_type_id(event_type),
+             now, duration_ms, meta_blob),
         )
-        self.conn.commit()
+        tp_id = self._cur.lastrowid
 
-        # Check for stage transition based on entry_event match
+        # Check for stage transition based on entry_event match, and fold the
+        # stage into the session's visited bitmask while we are here so
+        # end_session can decode the path without re-scanning touchpoints.
         stage_info: Dict[str, Any] = {}
-        cur.execute(
-            "SELECT * FROM funnel_stages WHERE entry_event = ? ORDER BY position",
-            (event_type,),
-        )
-        row = cur.fetchone()
-        if row:
+        stage = self._events_map().get(event_type)
+        if stage:
             stage_info = {
-                "stage_entered": row["name"],
-                "position": row["position"],
-                "stage_id": row["id"],
+                "stage_entered": stage["name"],
+                "position": stage["position"],
+                "stage_id": stage["id"],
             }
+            self._cur.execute(
+                """UPDATE sessions SET stages_visited_mask = stages_visited_mask | ?
+                   WHERE id = ?""",
+                (1 << stage["position"], session_id),
+            )
+        if commit and not self._txn_depth:
+            self.conn.commit()
         return {"touchpoint_id": tp_id, **stage_info}
 
+    def record_touchpoints_bulk(
+        self, touchpoints: List[Tuple[int, str, str, str, str, int, Optional[Dict[str, Any]]]]
+    ) -> List[Dict[str, Any]]:
+        """Insert many touchpoints in one transaction.
+
+        Each tuple is (session_id, customer_id, channel, page, event_type,
+        duration_ms, metadata). A single BEGIN…COMMIT amortizes the journal
+        flush over the whole batch instead of paying it per row. Returns one
+        dict per row with the same shape as :meth:`record_touchpoint`.
+        """
+        now = _now_ms()
+        rows = [
+            (self._next_uuid().bytes, sid, cid, self._channel_id(channel), page,
+             self._event_type_id(event_type), now, duration_ms, _pack_meta(metadata))
+            for sid, cid, channel, page, event_type, duration_ms, metadata
+            in touchpoints
+        ]
+        # Accumulate the per-session visited bitmask in Python so the whole
+        # batch needs one mask UPDATE per session, not per touchpoint.
+        masks: Dict[int, int] = {}
+        with self.transaction():
+            self.conn.executemany(_INSERT_TP_SQL, rows)
+            # AUTOINCREMENT ids are contiguous within a single write
+            # transaction, so the batch spans (last - n, last].
+            last = self.conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+
+            results: List[Dict[str, Any]] = []
+            first = last - len(rows) + 1
+            for i, (sid, _, _, _, event_type, _, _) in enumerate(touchpoints):
+                info: Dict[str, Any] = {"touchpoint_id": first + i}
+                stage = self._events_map().get(event_type)
+                if stage:
+                    info.update(
+                        stage_entered=stage["name"],
+                        position=stage["position"],
+                        stage_id=stage["id"],
+                    )
+                    masks[sid] = masks.get(sid, 0) | (1 << stage["position"])
+                results.append(info)
+            if masks:
+                self.conn.executemany(
+                    """UPDATE sessions SET stages_visited_mask = stages_visited_mask | ?
+                       WHERE id = ?""",
+                    [(mask, sid) for sid, mask in masks.items()],
+                )
+        return results
+
     def end_session(
         self,
-        session_id: str,
+        session_id: int,
         converted: bool = False,
         conversion_value: float = 0.0,
     ) -> ConversionPath:
         """Close a session, build the conversion path, and detect dropoffs."""
-        now = datetime.datetime.utcnow().isoformat()
-        cur = self.conn.cursor()
-        cur.execute(
-            """UPDATE sessions SET end_time=?, converted=?, conversion_value=?
-               WHERE id=?""",
-            (now, int(converted), conversion_value, session_id),
-        )
+        now = _now_ms()
+        with self.transaction():
+            cur = self.conn.cursor()
+            cur.execute(
+                """UPDATE sessions SET end_time=?, converted=?, conversion_value=?
+                   WHERE id=?""",
+                (now, int(converted), conversion_value, session_id),
+            )
 
-        # Build ordered list of stages visited in this session
-        cur.execute(
-            """SELECT DISTINCT fs.id, fs.name, fs.position
-               FROM touchpoints tp
-               JOIN funnel_stages fs ON tp.event_type = fs.entry_event
-               WHERE tp.session_id = ?
-               ORDER BY fs.position""",
-            (session_id,),
-        )
-        stages = cur.fetchall()
-        stages_visited = [r["name"] for r in stages]
-        path_signature = " → ".join(stages_visited) if stages_visited else "direct"
+            # Single-row fetch: the write path already folded every visited
+            # stage into stages_visited_mask, so closing a session no longer
+            # touches the touchpoints table at all.
+            cur.row_factory = None
+            srow = cur.execute(
+                """SELECT c.name, s.start_time, s.stages_visited_mask
+                   FROM sessions s
+                   JOIN channels c ON c.id = s.channel_id
+                   WHERE s.id = ?""",
+                (session_id,),
+            ).fetchone()
+            mask = srow[2] if srow else 0
+
+            # Keep the channel_daily rollup in step, attributed to the
+            # session's channel and start day.
+            if converted and srow:
+                self.conn.execute(
+                    """UPDATE channel_daily
+                       SET conversions = conversions + 1,
+                           value_sum   = value_sum + ?
+                       WHERE channel = ? AND day = ?""",
+                    (conversion_value, srow[0], _day_str(srow[1])),
+                )
 
-        path_id = str(uuid.uuid4())
-        cur.execute(
-            """INSERT INTO conversion_paths
-               (id, session_id, stages_visited, path_signature, converted, created_at)
-               VALUES (?, ?, ?, ?, ?, ?)""",
-            (path_id, session_id, json.dumps(stages_visited),
-             path_signature, int(converted), now),
-        )
+            # Decode the visited bitmask back into ordered stages through the
+            # in-memory cache.
+            by_position = {
+                s["position"]: s for s in self._events_map().values()
+            }
+            order, packed_sig = _reduce_path(
+                p for p in by_position if mask >> p & 1
+            )
+            visited = [by_position[p] for p in order]
+            cur.row_factory = self.conn.row_factory
+            stages_visited = [s["name"] for s in visited]
+            path_signature = " → ".join(stages_visited) if stages_visited else "direct"
 
-        # Detect dropoffs: all stages NOT visited
-        if not converted:
-            cur.execute("SELECT * FROM funnel_stages ORDER BY position")
-            all_stages = cur.fetchall()
-            visited_names = set(stages_visited)
-            for st in all_stages:
-                if st["name"] not in visited_names:
-                    drop_id = str(uuid.uuid4())
+            cur.execute(
+                """INSERT INTO conversion_paths
+                   (uuid, session_id, stages_visited, path_signature, path_sig,
+                    converted, created_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                (self._next_uuid().bytes, session_id, json.dumps(stages_visited),
+                 path_signature, packed_sig, int(converted), now),
+            )
+            path_id = cur.lastrowid
+
+            cur.execute(
+                """INSERT INTO path_stats (path_sig, path_signature, occurrences, conversions)
+                   VALUES (?, ?, 1, ?)
+                   ON CONFLICT(path_sig) DO UPDATE SET
+                       occurrences = occurrences + 1,
+                       conversions = conversions + excluded.conversions""",
+                (packed_sig, path_signature, int(converted)),
+            )
+
+            # Detect dropoff: record the first stage NOT visited, resolved
+            # from the in-memory stage cache instead of re-querying
+            # funnel_stages.
+            if not converted:
+                visited_names = set(stages_visited)
+                first_missed = next(
+                    (s for s in sorted(self._events_map().values(),
+                                       key=lambda s: s["position"])
+                     if s["name"] not in visited_names),
+                    None,
+                )
+                if first_missed:
                     cur.execute(
                         """INSERT INTO dropoff_events
-                           (id, session_id, stage_id, stage_name, timestamp, reason)
+                           (uuid, session_id, stage_id, stage_name, timestamp, reason)
                            VALUES (?, ?, ?, ?, ?, ?)""",
-                        (drop_id, session_id, st["id"], st["name"], now, "stage_not_reached"),
+                        (self._next_uuid().bytes, session_id, first_missed["id"],
+                         first_missed["name"], now, "stage_not_reached"),
                     )
-                    break  # Record only the first missed stage as the dropoff point
 
-        self.conn.commit()
         return ConversionPath(
             path_id, session_id, stages_visited, path_signature, converted, now
         )
@@ -306,123 +735,113 @@ class CustomerJourneyMapper:
 
     def analyze_funnel(self, days: int = 30) -> List[Dict[str, Any]]:
         """Per-stage funnel metrics: entry count, conversion rate, avg time, drop-off rate."""
-        cutoff = (
-            datetime.datetime.utcnow() - datetime.timedelta(days=days)
-        ).isoformat()
-        cur = self.conn.cursor()
-        cur.execute("SELECT * FROM funnel_stages ORDER BY position")
-        stages = cur.fetchall()
+        cutoff = _now_ms() - days * 86_400_000
+        cur = self.read_conn.cursor()
 
-        results = []
-        total_sessions_query = cur.execute(
-            "SELECT COUNT(*) FROM sessions WHERE start_time >= ?", (cutoff,)
-        ).fetchone()[0]
-
-        for i, stage in enumerate(stages):
-            # Sessions that reached this stage
-            cur.execute(
-                """SELECT COUNT(DISTINCT tp.session_id) FROM touchpoints tp
+        # One pass over touchpoints aggregated per event, then one join back
+        # to funnel_stages — instead of 2-3 queries per stage in a Python loop.
+        cur.execute(
+            """WITH ev AS (
+                   SELECT tp.event_type_id AS event_type_id,
+                          COUNT(DISTINCT tp.session_id) AS entry_count,
+                          COUNT(DISTINCT CASE WHEN s.converted = 1
+                                              THEN tp.session_id END) AS converted_count,
+                          AVG(tp.duration_ms) AS avg_dur
+                   FROM touchpoints tp
                    JOIN sessions s ON tp.session_id = s.id
-                   WHERE tp.event_type = ? AND s.start_time >= ?""",
-                (stage["entry_event"], cutoff),
-            )
-            entry_count = cur.fetchone()[0]
-
-            # Sessions that exited (reached next stage)
-            exit_count = 0
-            if i + 1 < len(stages):
-                next_stage = stages[i + 1]
-                cur.execute(
-                    """SELECT COUNT(DISTINCT tp.session_id) FROM touchpoints tp
-                       JOIN sessions s ON tp.session_id = s.id
-                       WHERE tp.event_type = ? AND s.start_time >= ?""",
-                    (next_stage["entry_event"], cutoff),
-                )
-                exit_count = cur.fetchone()[0]
+                   WHERE s.start_time >= ?
+                   GROUP BY tp.event_type_id
+               )
+               SELECT fs.id, fs.name, fs.position,
+                      COALESCE(ev.entry_count, 0)     AS entry_count,
+                      COALESCE(ev.converted_count, 0) AS converted_count,
+                      COALESCE(ev.avg_dur, 0.0)       AS avg_dur,
+                      nxt.entry_event                 AS next_entry_event,
+                      COALESCE(nxt_ev.entry_count, 0) AS next_entry_count
+               FROM funnel_stages fs
+               LEFT JOIN event_types et ON et.name = fs.entry_event
+               LEFT JOIN ev ON ev.event_type_id = et.id
+               LEFT JOIN funnel_stages nxt
+                   ON nxt.position = (SELECT MIN(position) FROM funnel_stages
+                                      WHERE position > fs.position)
+               LEFT JOIN event_types net ON net.name = nxt.entry_event
+               LEFT JOIN ev nxt_ev ON nxt_ev.event_type_id = net.id
+               ORDER BY fs.position""",
+            (cutoff,),
+        )
+
+        results = []
+        for row in cur.fetchall():
+            entry_count = row["entry_count"]
+            # Exits = entries into the next stage; for the last stage,
+            # exits = conversions.
+            if row["next_entry_event"] is not None:
+                exit_count = row["next_entry_count"]
             else:
-                # Last stage: exits = conversions
-                cur.execute(
-                    """SELECT COUNT(DISTINCT s.id) FROM sessions s
-                       JOIN touchpoints tp ON s.id = tp.session_id
-                       WHERE s.converted = 1 AND tp.event_type = ?
-                       AND s.start_time >= ?""",
-                    (stage["entry_event"], cutoff),
-                )
-                exit_count = cur.fetchone()[0]
+                exit_count = row["converted_count"]
 
             conversion_rate = (exit_count / entry_count * 100) if entry_count else 0.0
             drop_off_rate = 100.0 - conversion_rate
 
-            # Average duration at this stage (ms)
-            cur.execute(
-                """SELECT AVG(duration_ms) FROM touchpoints tp
-                   JOIN sessions s ON tp.session_id = s.id
-                   WHERE tp.event_type = ? AND s.start_time >= ?""",
-                (stage["entry_event"], cutoff),
-            )
-            avg_dur = cur.fetchone()[0] or 0.0
-
             results.append({
-                "stage_id": stage["id"],
-                "stage_name": stage["name"],
-                "position": stage["position"],
+                "stage_id": row["id"],
+                "stage_name": row["name"],
+                "position": row["position"],
                 "entry_count": entry_count,
                 "exit_count": exit_count,
                 "conversion_rate": round(conversion_rate, 2),
                 "drop_off_rate": round(drop_off_rate, 2),
-                "avg_duration_ms": round(avg_dur, 2),
+                "avg_duration_ms": round(row["avg_dur"], 2),
             })
         return results
 
-    def get_top_conversion_paths(self, limit: int = 10) -> List[Dict[str, Any]]:
-        """Group path signatures and return top paths by frequency."""
-        cur = self.conn.cursor()
+    def get_top_conversion_paths(self, limit: int = 10) -> List[sqlite3.Row]:
+        """Group path signatures and return top paths by frequency.
+
+        Rows come back as :class:`sqlite3.Row` (key and index access) — no
+        per-row dict materialization.
+        """
+        cur = self.read_conn.cursor()
         cur.execute(
-            """SELECT path_signature,
-                      COUNT(*) as occurrences,
-                      SUM(converted) as conversions,
-                      ROUND(100.0 * SUM(converted) / COUNT(*), 2) as conversion_rate
-               FROM conversion_paths
-               GROUP BY path_signature
+            """SELECT path_signature, occurrences, conversions,
+                      ROUND(100.0 * conversions / occurrences, 2) as conversion_rate
+               FROM path_stats
                ORDER BY occurrences DESC
                LIMIT ?""",
             (limit,),
         )
-        rows = cur.fetchall()
-        return [dict(r) for r in rows]
+        return cur.fetchall()
 
     def analyze_dropoffs(self, stage_id: str) -> Dict[str, Any]:
         """Aggregate dropoff reasons, time-of-day patterns, and channel breakdown."""
-        cur = self.conn.cursor()
+        cur = self.read_conn.cursor()
 
-        # Reason aggregation
+        # One round-trip: reason, hour and channel aggregates come back as a
+        # tagged union instead of three separate queries.
         cur.execute(
-            """SELECT reason, COUNT(*) as count
+            """SELECT 'reason' AS kind, reason AS bucket, COUNT(*) AS count
                FROM dropoff_events WHERE stage_id = ?
-               GROUP BY reason ORDER BY count DESC""",
-            (stage_id,),
-        )
-        reasons = {r["reason"]: r["count"] for r in cur.fetchall()}
-
-        # Time-of-day pattern (hour buckets)
-        cur.execute(
-            """SELECT CAST(SUBSTR(timestamp, 12, 2) AS INTEGER) as hour, COUNT(*) as count
+               GROUP BY reason
+               UNION ALL
+               SELECT 'hour', hour, COUNT(*)
                FROM dropoff_events WHERE stage_id = ?
-               GROUP BY hour ORDER BY hour""",
-            (stage_id,),
-        )
-        time_pattern = {r["hour"]: r["count"] for r in cur.fetchall()}
-
-        # Channel breakdown via joined session
-        cur.execute(
-            """SELECT s.channel, COUNT(*) as count
+               GROUP BY hour
+               UNION ALL
+               SELECT 'channel', c.name, COUNT(*)
                FROM dropoff_events de
                JOIN sessions s ON de.session_id = s.id
+               JOIN channels c ON c.id = s.channel_id
                WHERE de.stage_id = ?
-               GROUP BY s.channel ORDER BY count DESC""",
-            (stage_id,),
+               GROUP BY s.channel_id""",
+            (stage_id, stage_id, stage_id),
         )
-        channels = {r["channel"]: r["count"] for r in cur.fetchall()}
+
+        reasons: Dict[str, int] = {}
+        time_pattern: Dict[int, int] = {}
+        channels: Dict[str, int] = {}
+        dispatch = {"reason": reasons, "hour": time_pattern, "channel": channels}
+        for row in cur.fetchall():
+            dispatch[row["kind"]][row["bucket"]] = row["count"]
 
         return {
             "stage_id": stage_id,
@@ -432,78 +851,103 @@ class CustomerJourneyMapper:
             "total_dropoffs": sum(reasons.values()),
         }
 
-    def get_channel_attribution(self, days: int = 30) -> List[Dict[str, Any]]:
-        """Per-channel sessions, conversions, conversion_rate, avg_value."""
-        cutoff = (
-            datetime.datetime.utcnow() - datetime.timedelta(days=days)
-        ).isoformat()
-        cur = self.conn.cursor()
+    def get_channel_attribution(self, days: int = 30) -> List[sqlite3.Row]:
+        """Per-channel sessions, conversions, conversion_rate, avg_value.
+
+        Returned as :class:`sqlite3.Row` objects rather than dicts.
+        """
+        day_cutoff = _day_str(_now_ms() - days * 86_400_000)
+        cur = self.read_conn.cursor()
+        # Day-granular read over the channel_daily rollup: at most
+        # days × channels rows instead of a scan over sessions. The rollup's
+        # (channel, day) primary key doubles as the grouping index, so no
+        # extra sessions(channel, start_time) index is needed here.
         cur.execute(
             """SELECT channel,
-                      COUNT(*) as sessions,
-                      SUM(converted) as conversions,
-                      ROUND(100.0 * SUM(converted) / COUNT(*), 2) as conversion_rate,
-                      ROUND(AVG(CASE WHEN converted=1 THEN conversion_value ELSE NULL END), 2)
-                          as avg_value
-               FROM sessions WHERE start_time >= ?
+                      SUM(sessions) as sessions,
+                      SUM(conversions) as conversions,
+                      ROUND(100.0 * SUM(conversions) / SUM(sessions), 2) as conversion_rate,
+                      CASE WHEN SUM(conversions) > 0
+                           THEN ROUND(SUM(value_sum) / SUM(conversions), 2)
+                      END as avg_value
+               FROM channel_daily WHERE day >= ?
                GROUP BY channel ORDER BY conversions DESC""",
-            (cutoff,),
+            (day_cutoff,),
         )
-        return [dict(r) for r in cur.fetchall()]
+        return cur.fetchall()
 
     def compute_customer_ltv_segments(self, buckets: int = 5) -> List[Dict[str, Any]]:
         """Segment customers by total conversion_value using equal-width bucketing."""
-        cur = self.conn.cursor()
+        cur = self.read_conn.cursor()
+        # Aggregate and bucket inside SQLite so only `buckets` rows cross the
+        # boundary instead of one per converted customer. Clamping the bucket
+        # index keeps the last bucket's right edge inclusive.
         cur.execute(
-            """SELECT customer_id, SUM(conversion_value) as ltv
-               FROM sessions WHERE converted = 1
-               GROUP BY customer_id"""
+            """WITH l AS (
+                   SELECT customer_id, SUM(conversion_value) AS ltv
+                   FROM sessions WHERE converted = 1
+                   GROUP BY customer_id
+               ),
+               w AS (
+                   SELECT MIN(ltv) AS lo,
+                          CASE WHEN MAX(ltv) > MIN(ltv)
+                               THEN (MAX(ltv) - MIN(ltv)) / ?
+                               ELSE 1.0 END AS width
+                   FROM l
+               )
+               SELECT MIN(CAST((l.ltv - w.lo) / w.width AS INTEGER), ? - 1) AS bucket,
+                      COUNT(*) AS cnt,
+                      MIN(w.lo) AS lo,
+                      MIN(w.width) AS width
+               FROM l, w
+               GROUP BY bucket""",
+            (buckets, buckets),
         )
         rows = cur.fetchall()
         if not rows:
             return []
 
-        ltvs = [r["ltv"] for r in rows]
-        min_ltv, max_ltv = min(ltvs), max(ltvs)
-        width = (max_ltv - min_ltv) / buckets if max_ltv > min_ltv else 1.0
+        min_ltv = rows[0]["lo"]
+        width = rows[0]["width"]
+        counts = [0] * buckets
+        for r in rows:
+            counts[r["bucket"]] = r["cnt"]
 
         segments: List[Dict[str, Any]] = []
         for i in range(buckets):
             lo = min_ltv + i * width
-            hi = lo + width
-            members = [r["customer_id"] for r in rows if lo <= r["ltv"] < hi]
-            # Last bucket is inclusive on right
-            if i == buckets - 1:
-                members = [r["customer_id"] for r in rows if lo <= r["ltv"] <= hi]
             segments.append({
                 "bucket": i + 1,
                 "ltv_min": round(lo, 2),
-                "ltv_max": round(hi, 2),
-                "customer_count": len(members),
+                "ltv_max": round(lo + width, 2),
+                "customer_count": counts[i],
                 "label": f"Segment {i + 1}",
             })
         return segments
 
     def get_journey_heatmap(self, hours: int = 168) -> Dict[str, Any]:
         """Return a 24×7 matrix of touchpoint counts by hour-of-day × day-of-week."""
-        cutoff = (
-            datetime.datetime.utcnow() - datetime.timedelta(hours=hours)
-        ).isoformat()
-        cur = self.conn.cursor()
+        cutoff = _now_ms() - hours * 3_600_000
+        cur = self.read_conn.cursor()
+        # Plain tuples for this fetch: sqlite3.Row's name lookup is overhead
+        # we don't need when unpacking three known columns.
+        cur.row_factory = None
+        # Bucket in SQL with plain integer arithmetic on the epoch-ms
+        # timestamps so Python sees at most 7×24 rows. Day 0 of the epoch was
+        # a Thursday, hence the +3 to land on Monday=0.
         cur.execute(
-            """SELECT timestamp FROM touchpoints WHERE timestamp >= ?""",
+            """SELECT (timestamp / 86400000 + 3) % 7 AS dow,
+                      (timestamp / 3600000) % 24     AS hr,
+                      COUNT(*) AS count
+               FROM touchpoints WHERE timestamp >= ?
+               GROUP BY dow, hr""",
             (cutoff,),
         )
-        rows = cur.fetchall()
 
         # matrix[day_of_week][hour] — Mon=0 … Sun=6
         matrix: List[List[int]] = [[0] * 24 for _ in range(7)]
-        for r in rows:
-            try:
-                dt = datetime.datetime.fromisoformat(r["timestamp"])
-                matrix[dt.weekday()][dt.hour] += 1
-            except (ValueError, TypeError):
-                pass
+        for dow, hr, count in cur:
+            matrix[dow][hr] += count
 
         day_names = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
         return {
@@ -514,18 +958,37 @@ class CustomerJourneyMapper:
         }
 
     def close(self) -> None:
+        if self.read_conn is not self.conn:
+            self.read_conn.close()
         self.conn.close()
 
 
 # ── ASCII Funnel Visualisation ─────────────────────────────────────────────────
 
+# Precomputed render pieces: fixed-width bars and padding come from lookup
+# tables and the row templates are built once, so refresh loops don't redo
+# the same string multiplication and color interpolation per frame.
+_FUNNEL_WIDTH = 60
+_BAR_CACHE = ["█" * i for i in range(_FUNNEL_WIDTH + 1)]
+_PAD_CACHE = [" " * i for i in range(_FUNNEL_WIDTH + 1)]
+_STAGE_ROW_FMT = "  " + BOLD + "Stage {pos:>2}: {name:<20}" + NC
+_METRICS_ROW_FMT = (
+    "        Entries: {entry:<6}  "
+    "Conv: {color}{conv:>5.1f}%" + NC + "  "
+    "Drop: " + RED + "{drop:>5.1f}%" + NC + "  "
+    "Avg: " + DIM + "{avg:.0f}ms" + NC
+)
+_HEAT_BLOCKS = " ░▒▓█"
+_HEAT_BLOCKS_DOUBLE = [b * 2 for b in _HEAT_BLOCKS]
+
+
 def render_funnel(stages: List[Dict[str, Any]]) -> None:
     """Render an ASCII funnel with unicode box chars."""
     if not stages:
         print(f"{YELLOW}No funnel stages defined.{NC}")
         return
 
-    max_width = 60
+    max_width = _FUNNEL_WIDTH
     print(f"\n{BOLD}{CYAN}{'═' * max_width}{NC}")
     print(f"{BOLD}{CYAN}  CUSTOMER JOURNEY FUNNEL{NC}")
     print(f"{BOLD}{CYAN}{'═' * max_width}{NC}\n")
@@ -535,24 +998,24 @@ def render_funnel(stages: List[Dict[str, Any]]) -> None:
     for idx, stage in enumerate(stages):
         entry = stage["entry_count"]
         ratio = (entry / top_entry) if top_entry else 0
-        bar_width = max(4, int(ratio * (max_width - 20)))
-        bar = "█" * bar_width
-        padding = " " * ((max_width - bar_width) // 2)
+        # ratio can exceed 1 when sessions skip the first stage, so clamp
+        # the bar (and the pad index it implies) to the cached range.
+        bar_width = min(max(4, int(ratio * (max_width - 20))), max_width)
+        bar = _BAR_CACHE[bar_width]
+        padding = _PAD_CACHE[max(0, (max_width - bar_width) // 2)]
 
         color = GREEN if stage["conversion_rate"] >= 50 else (
             YELLOW if stage["conversion_rate"] >= 25 else RED
         )
 
-        print(f"  {BOLD}Stage {stage['position']:>2}: {stage['stage_name']:<20}{NC}")
+        print(_STAGE_ROW_FMT.format(pos=stage["position"], name=stage["stage_name"]))
         print(f"  {padding}{color}{bar}{NC}")
-        print(
-            f"  {'':>4}  Entries: {entry:<6}  "
-            f"Conv: {color}{stage['conversion_rate']:>5.1f}%{NC}  "
-            f"Drop: {RED}{stage['drop_off_rate']:>5.1f}%{NC}  "
-            f"Avg: {DIM}{stage['avg_duration_ms']:.0f}ms{NC}"
-        )
+        print(_METRICS_ROW_FMT.format(
+            entry=entry, color=color, conv=stage["conversion_rate"],
+            drop=stage["drop_off_rate"], avg=stage["avg_duration_ms"],
+        ))
         if idx < len(stages) - 1:
-            arrow_pad = " " * (max_width // 2 - 1)
+            arrow_pad = _PAD_CACHE[max_width // 2 - 1]
             print(f"  {arrow_pad}{DIM}▼{NC}")
     print(f"\n  {BOLD}{CYAN}{'═' * max_width}{NC}\n")
 
@@ -563,18 +1026,21 @@ def render_heatmap(heatmap: Dict[str, Any]) -> None:
     day_labels = heatmap["day_labels"]
     flat       = [v for row in matrix for v in row]
     max_val    = max(flat) if flat else 1
-    blocks     = " ░▒▓█"
 
     print(f"\n{BOLD}{CYAN}  JOURNEY HEATMAP  (last {heatmap['total_touchpoints']} touchpoints){NC}")
     header = "     " + "".join(f"{h:>3}" for h in range(0, 24, 2))
     print(f"{DIM}{header}{NC}")
+    levels = len(_HEAT_BLOCKS) - 1
     for d_idx, day in enumerate(day_labels):
-        row = ""
-        for h in range(24):
-            val = matrix[d_idx][h]
-            lvl = int((val / max_val) * (len(blocks) - 1)) if max_val else 0
-            row += blocks[lvl] * 2 if h % 2 == 0 else ""
-        print(f"  {BOLD}{day}{NC}  {row}")
+        # Only even hours render (two chars each); join a list of cached
+        # double-blocks instead of growing a string per cell.
+        cells = [
+            _HEAT_BLOCKS_DOUBLE[
+                int((matrix[d_idx][h] / max_val) * levels) if max_val else 0
+            ]
+            for h in range(0, 24, 2)
+        ]
+        print(f"  {BOLD}{day}{NC}  {''.join(cells)}")
     print()
 
 
@@ -678,6 +1144,10 @@ def build_parser() -> argparse.ArgumentParser:
         description="BlackRoad Customer Journey Mapper",
     )
     parser.add_argument("--db", default=DEFAULT_DB, help="SQLite database path")
+    parser.add_argument(
+        "--read-replica", dest="read_replica", default=None,
+        help="Read-only replica DB for analytics queries",
+    )
     sub = parser.add_subparsers(dest="command")
 
     # funnel
@@ -701,7 +1171,7 @@ def build_parser() -> argparse.ArgumentParser:
 
     # touchpoint
     p_tp = sub.add_parser("touchpoint", help="Record a touchpoint")
-    p_tp.add_argument("session_id")
+    p_tp.add_argument("session_id", type=int)
     p_tp.add_argument("customer_id")
     p_tp.add_argument("channel")
     p_tp.add_argument("page")
@@ -739,7 +1209,7 @@ def main() -> None:
         parser.print_help()
         sys.exit(0)
 
-    mapper = CustomerJourneyMapper(db_path=args.db)
+    mapper = CustomerJourneyMapper(db_path=args.db, read_replica=args.read_replica)
     try:
         dispatch = {
             "funnel":     cmd_funnel,
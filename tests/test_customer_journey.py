@@ -1,37 +1,71 @@
 """
 Tests for BlackRoad Customer Journey Mapper.
 """
-import sys
-import os
-import tempfile
+import sqlite3
+
 import pytest
 
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
 from customer_journey import CustomerJourneyMapper
 
 
-@pytest.fixture
-def mapper(tmp_path):
-    db = str(tmp_path / "test_journey.db")
+@pytest.fixture(scope="session")
+def template_db(tmp_path_factory):
+    """In-memory DB with the schema built once per test session.
+
+    Each test clones it with SQLite's backup() API instead of re-running
+    the full DDL script.
+    """
+    seed = str(tmp_path_factory.mktemp("template") / "seed.db")
+    m = CustomerJourneyMapper(db_path=seed)
+    template = sqlite3.connect(":memory:")
+    m.conn.backup(template)
+    m.close()
+    yield template
+    template.close()
+
+
+@pytest.fixture(scope="session")
+def _shared_mapper(tmp_path_factory, template_db):
+    """One mapper (connection, PRAGMAs, schema) for the whole test session."""
+    db = str(tmp_path_factory.mktemp("shared") / "journey.db")
+    dest = sqlite3.connect(db)
+    template_db.backup(dest)
+    dest.close()
     m = CustomerJourneyMapper(db_path=db)
     yield m
     m.close()
 
 
+@pytest.fixture
+def mapper(_shared_mapper):
+    """Shared mapper wrapped in a SAVEPOINT so each test sees a clean DB.
+
+    Raising _txn_depth keeps write methods from committing (a commit would
+    release the savepoint); the teardown rollback discards the test's writes.
+    """
+    m = _shared_mapper
+    m.conn.execute("SAVEPOINT t")
+    m._txn_depth += 1
+    yield m
+    m._txn_depth -= 1
+    m.conn.execute("ROLLBACK TO t")
+    m.conn.execute("RELEASE t")
+    # Drop caches that may reference rows the rollback just removed
+    m._stage_by_entry = None
+    m._channel_ids.clear()
+    m._event_type_ids.clear()
+
+
 # ── Helpers ────────────────────────────────────────────────────────────────────
 
 def _add_default_stages(mapper):
-    stages = [
+    return mapper.define_funnel_stages_bulk([
         ("Awareness",    1, "User discovers brand",      "page_view",   "search"),
         ("Interest",     2, "User engages with content", "search",      "product_view"),
         ("Consideration",3, "User evaluates product",    "product_view","add_to_cart"),
         ("Intent",       4, "User adds to cart",         "add_to_cart", "checkout_start"),
         ("Purchase",     5, "User completes purchase",   "checkout_start","purchase"),
-    ]
-    created = []
-    for name, pos, desc, entry, exit_ in stages:
-        created.append(mapper.define_funnel_stage(name, pos, desc, entry, exit_))
-    return created
+    ])
 
 
 # ── Tests ──────────────────────────────────────────────────────────────────────
@@ -48,6 +82,12 @@ def test_define_funnel(mapper):
     assert stages[2].entry_event == "product_view"
 
 
+def test_connection_uses_wal(mapper):
+    """The fixture DB runs in WAL mode with relaxed sync (set in __init__)."""
+    assert mapper.conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert mapper.conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+
+
 def test_session_lifecycle(mapper):
     """Start a session, add touchpoints, end the session."""
     _add_default_stages(mapper)
@@ -73,16 +113,22 @@ def test_funnel_analysis(mapper):
     _add_default_stages(mapper)
 
     # 10 sessions: 6 reach add_to_cart, 3 complete purchase
-    for i in range(10):
-        sid = mapper.start_session(f"cust-{i:03d}", "email", "mobile")
-        mapper.record_touchpoint(sid, f"cust-{i:03d}", "email", "/home", "page_view", 2000)
-        if i < 6:
-            mapper.record_touchpoint(sid, f"cust-{i:03d}", "email", "/shop", "add_to_cart", 1000)
-        if i < 3:
-            mapper.record_touchpoint(sid, f"cust-{i:03d}", "email", "/checkout", "checkout_start", 500)
-            mapper.end_session(sid, converted=True, conversion_value=49.99)
-        else:
-            mapper.end_session(sid, converted=False)
+    cids = [f"cust-{i:03d}" for i in range(10)]
+    with mapper.transaction():
+        sids = [mapper.start_session(cid, "email", "mobile") for cid in cids]
+        touchpoints = []
+        for i, sid in enumerate(sids):
+            touchpoints.append((sid, cids[i], "email", "/home", "page_view", 2000, None))
+            if i < 6:
+                touchpoints.append((sid, cids[i], "email", "/shop", "add_to_cart", 1000, None))
+            if i < 3:
+                touchpoints.append((sid, cids[i], "email", "/checkout", "checkout_start", 500, None))
+        mapper.record_touchpoints_bulk(touchpoints)
+        for i, sid in enumerate(sids):
+            if i < 3:
+                mapper.end_session(sid, converted=True, conversion_value=49.99)
+            else:
+                mapper.end_session(sid, converted=False)
 
     analysis = mapper.analyze_funnel(days=1)
     assert len(analysis) == 5, "Should return one entry per funnel stage"
@@ -92,30 +138,57 @@ def test_funnel_analysis(mapper):
     assert 0 <= awareness["conversion_rate"] <= 100
 
 
+def test_funnel_analysis_keeps_empty_stages(mapper):
+    """Stages with no touchpoints still appear, ordered by position."""
+    _add_default_stages(mapper)
+
+    sid = mapper.start_session("cust-solo", "organic", "desktop")
+    mapper.record_touchpoint(sid, "cust-solo", "organic", "/home", "page_view", 1200)
+    mapper.end_session(sid, converted=False)
+
+    analysis = mapper.analyze_funnel(days=1)
+    assert [s["position"] for s in analysis] == [1, 2, 3, 4, 5]
+    assert analysis[0]["entry_count"] == 1
+    # The grouped rewrite must keep zero-entry stages in the resultset
+    for stage in analysis[1:]:
+        assert stage["entry_count"] == 0
+        assert stage["conversion_rate"] == 0.0
+
+
 def test_conversion_paths(mapper):
     """Verify top paths aggregation groups identical path_signatures."""
     _add_default_stages(mapper)
 
     # Create 5 sessions with the same short path and 2 with a longer path
-    for i in range(5):
-        sid = mapper.start_session(f"cust-{i:03d}", "social", "desktop")
-        mapper.record_touchpoint(sid, f"cust-{i:03d}", "social", "/home", "page_view", 1000)
-        mapper.end_session(sid, converted=False)
+    cids = [f"cust-{i:03d}" for i in range(7)]
+    with mapper.transaction():
+        short_sids = [mapper.start_session(cid, "social", "desktop")
+                      for cid in cids[:5]]
+        mapper.record_touchpoints_bulk([
+            (sid, cid, "social", "/home", "page_view", 1000, None)
+            for cid, sid in zip(cids, short_sids)
+        ])
+        for sid in short_sids:
+            mapper.end_session(sid, converted=False)
 
-    for i in range(5, 7):
-        sid = mapper.start_session(f"cust-{i:03d}", "email", "mobile")
-        mapper.record_touchpoint(sid, f"cust-{i:03d}", "email", "/home", "page_view", 800)
-        mapper.record_touchpoint(sid, f"cust-{i:03d}", "email", "/shop", "add_to_cart", 400)
-        mapper.end_session(sid, converted=True, conversion_value=29.99)
+        long_sids = [mapper.start_session(cid, "email", "mobile")
+                     for cid in cids[5:]]
+        mapper.record_touchpoints_bulk([
+            tp for cid, sid in zip(cids[5:], long_sids)
+            for tp in ((sid, cid, "email", "/home", "page_view", 800, None),
+                       (sid, cid, "email", "/shop", "add_to_cart", 400, None))
+        ])
+        for sid in long_sids:
+            mapper.end_session(sid, converted=True, conversion_value=29.99)
 
     paths = mapper.get_top_conversion_paths(limit=5)
     assert len(paths) >= 1, "Should return at least one path"
     # Top path should have the highest occurrence count
     assert paths[0]["occurrences"] >= paths[-1]["occurrences"]
-    # Each entry must have required keys
+    # Each entry must have required keys (sqlite3.Row exposes them via keys())
     for p in paths:
-        assert "path_signature" in p
-        assert "conversion_rate" in p
+        assert "path_signature" in p.keys()
+        assert "conversion_rate" in p.keys()
 
 
 def test_dropoff_analysis(mapper):
@@ -124,11 +197,12 @@ def test_dropoff_analysis(mapper):
     intent_stage = next(s for s in stages if s.name == "Intent")
 
     # 4 sessions that reach Intent but don't convert
-    for i in range(4):
-        sid = mapper.start_session(f"drop-{i}", "paid", "desktop")
-        mapper.record_touchpoint(sid, f"drop-{i}", "paid", "/home", "page_view", 1500)
-        mapper.record_touchpoint(sid, f"drop-{i}", "paid", "/shop", "add_to_cart", 900)
-        mapper.end_session(sid, converted=False)
+    with mapper.transaction():
+        for i in range(4):
+            sid = mapper.start_session(f"drop-{i}", "paid", "desktop")
+            mapper.record_touchpoint(sid, f"drop-{i}", "paid", "/home", "page_view", 1500)
+            mapper.record_touchpoint(sid, f"drop-{i}", "paid", "/shop", "add_to_cart", 900)
+            mapper.end_session(sid, converted=False)
 
     result = mapper.analyze_dropoffs(intent_stage.id)
     # Intent stage may or may not have drops depending on path logic; just check structure
@@ -136,6 +210,9 @@ def test_dropoff_analysis(mapper):
     assert "by_channel" in result
     assert "time_of_day" in result
     assert isinstance(result["total_dropoffs"], int)
+    # The SQL-side hour binning must account for every dropoff exactly once
+    assert sum(result["time_of_day"].values()) == result["total_dropoffs"]
+    assert all(0 <= h <= 23 for h in result["time_of_day"])
 
 
 def test_channel_attribution(mapper):
@@ -148,15 +225,19 @@ def test_channel_attribution(mapper):
         ("paid",     3, 1, 99.00),
     ]
 
-    for channel, total, conv, value in channels_config:
-        for i in range(total):
-            sid = mapper.start_session(f"{channel}-cust-{i}", channel, "desktop")
-            mapper.record_touchpoint(sid, f"{channel}-cust-{i}", channel,
-                                     "/home", "page_view", 2000)
-            if i < conv:
-                mapper.end_session(sid, converted=True, conversion_value=value)
-            else:
-                mapper.end_session(sid, converted=False)
+    with mapper.transaction():
+        for channel, total, conv, value in channels_config:
+            cids = [f"{channel}-cust-{i}" for i in range(total)]
+            sids = [mapper.start_session(cid, channel, "desktop") for cid in cids]
+            mapper.record_touchpoints_bulk([
+                (sid, cid, channel, "/home", "page_view", 2000, None)
+                for cid, sid in zip(cids, sids)
+            ])
+            for i, sid in enumerate(sids):
+                if i < conv:
+                    mapper.end_session(sid, converted=True, conversion_value=value)
+                else:
+                    mapper.end_session(sid, converted=False)
 
     attr = mapper.get_channel_attribution(days=1)
     assert len(attr) == 3, "Should return one row per channel"